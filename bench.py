@@ -0,0 +1,210 @@
+"""Benchmarks."""
+
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+from candidates import CandidateSet
+import feedback
+import guess
+from suggestion_cache import SuggestionCache
+from wordle import Game
+
+FORMAT_VERSION = 1
+DEFAULT_THRESHOLD = 0.1
+CANDIDATE_SIZES = [10, 100, 1000, None]
+QUICK_CANDIDATE_SIZES = [10, 100]
+SOLVE_SEEDS = ["cigar", "mover", "waver", "rebut"]
+
+def measure(function, repeat):
+    """Times repeated calls to function, returning the run times in seconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def sample(size, seed=0):
+    """Returns a reproducible candidate set of the given size (every answer if None)."""
+    everything = CandidateSet.all()
+    if size is None or size >= len(everything):
+        return everything
+    return CandidateSet(np.sort(random.Random(seed).sample(range(len(everything)), size)))
+
+def cold_cache():
+    """Replaces the suggestion cache with an empty, memory-only one."""
+    guess.suggestion_cache = SuggestionCache(guess.SUGGESTION_CACHE_SIZE)
+
+def micro_benchmarks(sizes, repeat):
+    """Times evaluate, prune_candidates and make_suggestion at several candidate sizes."""
+    results = {}
+    rng = random.Random(0)
+    answers = feedback.matrix().answers
+    guesses = feedback.matrix().guesses
+    pairs = [(rng.choice(guesses), rng.choice(answers)) for _ in range(1000)]
+
+    results["evaluate[1000 pairs]"] = measure(
+        lambda: [guess.evaluate(word, goal) for word, goal in pairs], repeat)
+    results["evaluate_uncached[1000 pairs]"] = measure(
+        lambda: [guess._evaluate(word, goal) for word, goal in pairs], repeat)
+
+    for size in sizes:
+        candidates = sample(size)
+        label = len(candidates)
+        evaluation = guess.evaluate("arise", candidates.words()[0])
+
+        results[f"prune_candidates[{label}]"] = measure(
+            lambda: guess.prune_candidates(evaluation, "arise", candidates), repeat)
+        results[f"prune_candidates_list[{label}]"] = measure(
+            lambda: guess.prune_candidates(evaluation, "arise", candidates.words()), repeat)
+        results[f"make_suggestion[{label}]"] = measure(
+            lambda: guess._make_suggestion(candidates, guess.DEFAULT_CRITERION), repeat)
+
+    return results
+
+def macro_benchmarks(repeat, solve_all=True):
+    """Times Game.solve and Game.solve_all with cold and warm suggestion caches.
+        Returns the timings and the solve_all results."""
+    results = {}
+    solves, fails = None, None
+
+    for seed in SOLVE_SEEDS:
+        cold = []
+        for _ in range(repeat):
+            cold_cache()
+            cold += measure(Game(seed).solve, 1)
+        results[f"solve[{seed}, cold]"] = cold
+        results[f"solve[{seed}, warm]"] = measure(Game(seed).solve, repeat)
+
+    if solve_all:
+        cold = []
+        with redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                cold_cache()
+                start = time.perf_counter()
+                solves, fails = Game.solve_all()
+                cold.append(time.perf_counter() - start)
+            results["solve_all[cold]"] = cold
+            results["solve_all[warm]"] = measure(Game.solve_all, repeat)
+
+    return results, solves, fails
+
+def environment():
+    """Returns metadata about the machine and code being benchmarked."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "word_lists": feedback.matrix().digest.hex()
+    }
+
+def run(quick=False, repeat=5):
+    """Runs every benchmark, returning the results."""
+    # Load the word lists and feedback matrix up front, so no benchmark pays for it.
+    feedback.matrix()
+    benchmarks = micro_benchmarks(QUICK_CANDIDATE_SIZES if quick else CANDIDATE_SIZES, repeat)
+    macro, solves, fails = macro_benchmarks(1 if quick else max(1, repeat // 2), not quick)
+    benchmarks.update(macro)
+
+    return {
+        "version": FORMAT_VERSION,
+        "environment": environment(),
+        "benchmarks": {name: {"seconds": min(runs), "runs": runs}
+            for name, runs in benchmarks.items()},
+        "distribution": None if solves is None else {
+            str(guesses): count for guesses, count in sorted(solves.items())},
+        "failed": None if fails is None else sorted(fails)
+    }
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compares results against a baseline, returning a list of problems: benchmarks
+        slower by more than the threshold, or a changed result distribution."""
+    problems = []
+
+    for name, result in current["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        before = baseline["benchmarks"][name]["seconds"]
+        after = result["seconds"]
+        if before > 0 and after > before * (1 + threshold):
+            problems.append(f"{name}: {before:.6f}s -> {after:.6f}s "
+                f"({after / before - 1:+.1%})")
+
+    for key in ("distribution", "failed"):
+        if None not in (baseline.get(key), current.get(key)) and baseline[key] != current[key]:
+            problems.append(f"{key} changed: {baseline[key]} -> {current[key]}")
+
+    return problems
+
+def report(results, baseline=None):
+    """Prints the results, next to the baseline if one is given."""
+    for name, result in results["benchmarks"].items():
+        line = f"{name:<40} {result['seconds'] * 1000:>12.3f} ms"
+        if baseline is not None and name in baseline["benchmarks"]:
+            before = baseline["benchmarks"][name]["seconds"]
+            if before > 0:
+                line += f" {result['seconds'] / before - 1:>+8.1%}"
+        print(line)
+
+    if results.get("distribution") is not None:
+        print(f"Distribution: {results['distribution']}")
+
+def main(args):
+    """Run or compare benchmarks."""
+    if args.command == "run":
+        results = run(args.quick, args.repeat)
+        report(results)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)
+
+    report(current, baseline)
+    problems = compare(baseline, current, args.threshold)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='benchmark the wordle solver')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--output', '-o', default='bench.json', help='results path')
+    run_parser.add_argument('--repeat', default=5, type=int, help='runs per benchmark')
+    run_parser.add_argument('--quick', action="store_true",
+        help='fewer candidate sizes, and no solve_all')
+
+    compare_parser = subparsers.add_parser('compare', help='compare results against a baseline')
+    compare_parser.add_argument('baseline', help='baseline results path')
+    compare_parser.add_argument('current', help='current results path')
+    compare_parser.add_argument('--threshold', default=DEFAULT_THRESHOLD, type=float,
+        help='fractional slowdown counted as a regression')
+
+    sys.exit(main(parser.parse_args()))
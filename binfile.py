@@ -0,0 +1,36 @@
+"""Binary files."""
+
+import os
+
+def read_header(path, header):
+    """Returns the fields of the header struct at the start of the file at path,
+        or None if the file is missing or too short."""
+    try:
+        with open(path, "rb") as file:
+            data = file.read(header.size)
+    except OSError:
+        return None
+
+    if len(data) != header.size:
+        return None
+    return header.unpack(data)
+
+def write(path, header, header_size, chunks):
+    """Writes the packed header, padded to header_size, and then the chunks of
+        bytes to path. The file is written under a temporary name and renamed
+        into place, so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file:
+            file.write(header.ljust(header_size, b"\0"))
+            for chunk in chunks:
+                file.write(chunk)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
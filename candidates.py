@@ -0,0 +1,90 @@
+"""Candidates."""
+
+import hashlib
+import numpy as np
+import feedback
+
+class CandidateSet:
+    """An immutable set of candidate answers, stored as sorted indices into the
+        answers of the feedback matrix. Iterating yields words in answer order."""
+
+    def __init__(self, indices):
+        """Initialize a candidate set from sorted, unique answer indices."""
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.indices.flags.writeable = False
+
+    @classmethod
+    def all(cls):
+        """Returns the set of every answer."""
+        return cls(np.arange(len(feedback.matrix().answers)))
+
+    @classmethod
+    def from_words(cls, word_list):
+        """Returns the set of the given answers."""
+        feedback_matrix = feedback.matrix()
+        indices = []
+        for word in word_list:
+            index = feedback_matrix.column(word)
+            if index is None:
+                raise ValueError(f"Not a possible answer: {word}")
+            indices.append(index)
+        return cls(np.unique(np.asarray(indices, dtype=np.int32)))
+
+    def codes(self, guess):
+        """Returns the feedback codes of the guess against every candidate."""
+        feedback_matrix = feedback.matrix()
+        row = feedback_matrix.row(guess)
+        if row is None:
+            return feedback.compute([guess], self.words())[0]
+        return feedback_matrix.codes[row, self.indices]
+
+    def prune(self, guess, code):
+        """Returns the candidates whose feedback for the guess is the given code."""
+        return CandidateSet(self.indices[self.codes(guess) == code])
+
+    def words(self):
+        """Returns the candidates as a list of words."""
+        answers = feedback.matrix().answers
+        return [answers[i] for i in self.indices]
+
+    def __len__(self):
+        """Returns the number of candidates."""
+        return len(self.indices)
+
+    def __iter__(self):
+        """Iterates over the candidate words."""
+        return iter(self.words())
+
+    def __contains__(self, word):
+        """Returns whether the word is a candidate."""
+        index = feedback.matrix().column(word)
+        if index is None:
+            return False
+        position = np.searchsorted(self.indices, index)
+        return position < len(self.indices) and self.indices[position] == index
+
+    def __and__(self, other):
+        """Returns the candidates in both sets."""
+        return CandidateSet(np.intersect1d(self.indices, other.indices, assume_unique=True))
+
+    def __or__(self, other):
+        """Returns the candidates in either set."""
+        return CandidateSet(np.union1d(self.indices, other.indices))
+
+    def fingerprint(self):
+        """Returns a short digest of the candidates."""
+        return hashlib.blake2b(self.indices.tobytes(), digest_size=16).digest()
+
+    def __eq__(self, other):
+        """Returns whether both sets hold the same candidates."""
+        if not isinstance(other, CandidateSet):
+            return NotImplemented
+        return np.array_equal(self.indices, other.indices)
+
+    def __hash__(self):
+        """Hashes the candidate indices."""
+        return hash(self.indices.tobytes())
+
+    def __repr__(self):
+        """Returns the symbolic representation of the candidates."""
+        return f"CandidateSet({self.words()!r})"
@@ -0,0 +1,235 @@
+"""Feedback."""
+
+import hashlib
+import os
+import struct
+import numpy as np
+import binfile
+import lexicon
+
+MATRIX_DIRECTORY = "cache/"
+FORMAT_VERSION = 1
+
+# Header: magic, format version, word size, rows, columns, word list digest.
+_MAGIC = b"WORDLEFB"
+_HEADER = struct.Struct("<8sHHII32s")
+_HEADER_SIZE = 64
+
+# Evaluations are stored as base-3 codes, one digit per letter:
+# 'Absents' (None) are 0, 'Presents' (False) are 1 and 'Corrects' (True) are 2.
+_DIGITS = {None: 0, False: 1, True: 2}
+_VALUES = (None, False, True)
+
+# Up to this many candidates, counting sorted codes beats counting every code.
+SORTED_BUCKETS_LIMIT = 32
+
+def encode(evaluation):
+    """Encodes an evaluation as an integer feedback code."""
+    return sum(_DIGITS[value] * 3 ** i for i, value in enumerate(evaluation))
+
+def decode(code, size=None):
+    """Decodes an integer feedback code into an evaluation, for words of the given
+        size or else of the lexicon in use."""
+    if size is None:
+        size = matrix().size
+    return list(evaluations(size)[code])
+
+_evaluations = {}
+
+def evaluations(size):
+    """Returns the evaluation of every code of the given size, as tuples indexed by code."""
+    if size not in _evaluations:
+        table = []
+        for code in range(3 ** size):
+            evaluation = []
+            for _ in range(size):
+                code, digit = divmod(code, 3)
+                evaluation.append(_VALUES[digit])
+            table.append(tuple(evaluation))
+        _evaluations[size] = table
+    return _evaluations[size]
+
+def code_dtype(size):
+    """Returns the smallest unsigned dtype able to hold every code of the given size."""
+    return np.uint8 if 3 ** size <= 256 else np.uint16
+
+def letters(word_list):
+    """Returns the words as a (words, size) array of letter bytes."""
+    size = len(word_list[0]) if word_list else 0
+    return np.frombuffer("".join(word_list).encode("ascii"),
+        dtype=np.uint8).reshape(len(word_list), size)
+
+def compute(guesses, answers, chunk=512):
+    """Computes the feedback code of every guess against every answer.
+        Duplicate letters are scored as in guess.evaluate: each answer letter
+        which isn't already matched by a 'Correct' satisfies at most one
+        'Present', from left to right."""
+    guess_letters = letters(guesses)
+    answer_letters = letters(answers)
+    size = answer_letters.shape[1]
+    codes = np.empty((len(guesses), len(answers)), dtype=code_dtype(size))
+
+    for start in range(0, len(guesses), chunk):
+        block = guess_letters[start:start + chunk]
+        corrects = block[:, None, :] == answer_letters[None, :, :]
+        unmatched = ~corrects
+        result = np.zeros(corrects.shape[:2], dtype=np.int64)
+
+        for i in range(size):
+            letter = block[:, i, None]
+            available = np.zeros(result.shape, dtype=np.uint8)
+            for j in range(size):
+                available += (answer_letters[None, :, j] == letter) & unmatched[:, :, j]
+
+            # Earlier unmatched copies of this letter claim answer letters first.
+            claimed = np.zeros(result.shape, dtype=np.uint8)
+            for j in range(i):
+                claimed += (block[:, j, None] == letter) & unmatched[:, :, j]
+
+            presents = unmatched[:, :, i] & (available > claimed)
+            result += 3 ** i * (2 * corrects[:, :, i] + presents)
+
+        codes[start:start + chunk] = result
+
+    return codes
+
+def digest(guesses, answers):
+    """Returns a digest identifying the word lists a matrix was built from."""
+    hasher = hashlib.sha256()
+    hasher.update(" ".join(guesses).encode("ascii"))
+    hasher.update(b"|")
+    hasher.update(" ".join(answers).encode("ascii"))
+    return hasher.digest()
+
+class FeedbackMatrix:
+    """Feedback codes for every (guess, answer) pair of a lexicon, memory-mapped
+        from disk. Rows are guesses and columns are answers, both indexed by
+        word id."""
+
+    def __init__(self, codes, words):
+        """Initialize a feedback matrix for the lexicon."""
+        self.codes = codes
+        self.words = words
+        self.size = words.size
+        self.digest = digest(words.words, words.answers)
+
+    @property
+    def guesses(self):
+        """Returns every guess, ordered by row."""
+        return self.words.words
+
+    @property
+    def answers(self):
+        """Returns every answer, ordered by column."""
+        return self.words.answers
+
+    def row(self, guess):
+        """Returns the row of the guess, or None if it is not a valid guess."""
+        return self.words.id(guess)
+
+    def column(self, answer):
+        """Returns the column of the answer, or None if it is not a possible answer."""
+        return self.words.id(answer) if self.words.is_answer(answer) else None
+
+    def code(self, guess, answer):
+        """Returns the feedback code for the pair, or None if either word is unknown."""
+        row = self.row(guess)
+        column = self.column(answer)
+        if row is None or column is None:
+            return None
+        return self.codes.item(row, column)
+
+    @staticmethod
+    def save(path, words):
+        """Computes the matrix for the lexicon and writes it to path."""
+        codes = compute(words.words, words.answers)
+        header = _HEADER.pack(_MAGIC, FORMAT_VERSION, words.size,
+            len(words), words.answer_count, digest(words.words, words.answers))
+        binfile.write(path, header, _HEADER_SIZE, [codes.tobytes()])
+
+    @staticmethod
+    def is_current(path, words):
+        """Returns whether the file at path holds the matrix for the lexicon."""
+        header = binfile.read_header(path, _HEADER)
+        if header is None:
+            return False
+
+        magic, version, size, rows, columns, word_digest = header
+        return (magic == _MAGIC and version == FORMAT_VERSION
+            and size == words.size and rows == len(words)
+            and columns == words.answer_count
+            and word_digest == digest(words.words, words.answers)
+            and os.path.getsize(path) == _HEADER_SIZE
+                + rows * columns * np.dtype(code_dtype(size)).itemsize)
+
+    @classmethod
+    def load(cls, path, words):
+        """Memory-maps the matrix for the lexicon at path, rebuilding it if it is
+            missing or stale."""
+        if not cls.is_current(path, words):
+            cls.save(path, words)
+
+        codes = np.memmap(path, dtype=code_dtype(words.size), mode="r",
+            offset=_HEADER_SIZE, shape=(len(words), words.answer_count))
+        # A plain array view of the mapping indexes much faster than the memmap itself.
+        return cls(np.asarray(codes), words)
+
+def matrix_path(words):
+    """Returns where the matrix for the lexicon is stored."""
+    return os.path.join(MATRIX_DIRECTORY,
+        f"feedback-{digest(words.words, words.answers).hex()[:16]}.bin")
+
+_matrix = None
+
+def matrix():
+    """Returns the feedback matrix for the lexicon, loading it on first use.
+        Rows and columns are indexed by word id."""
+    global _matrix
+    if _matrix is None:
+        words = lexicon.default()
+        _matrix = FeedbackMatrix.load(matrix_path(words), words)
+    return _matrix
+
+def lookup(guess, answer):
+    """Returns the feedback code for the pair, or None if the guess is not in the
+        lexicon or the answer is not one of its answers."""
+    feedback_matrix = matrix()
+    ids = feedback_matrix.words.ids
+    row = ids.get(guess)
+    column = ids.get(answer)
+    if row is None or column is None or column >= feedback_matrix.words.answer_count:
+        return None
+    return feedback_matrix.codes.item(row, column)
+
+def codes_for(candidates):
+    """Returns the (guesses, candidates) feedback codes of every guess in the
+        word lists against the candidates."""
+    feedback_matrix = matrix()
+    columns = [feedback_matrix.column(cand) for cand in candidates]
+    if None in columns:
+        return compute(feedback_matrix.guesses, list(candidates))
+    return feedback_matrix.codes[:, columns]
+
+def bucket_counts(codes, buckets, chunk_size=1 << 22):
+    """Returns, for each row of codes, how many columns fall into each feedback
+        code. Buckets are in no particular order and padded with zeros; narrow
+        rows get one bucket per column rather than one per code."""
+    rows, columns = codes.shape
+    if columns <= SORTED_BUCKETS_LIMIT and columns < buckets:
+        # Number each row's distinct codes in sorted order instead.
+        codes = np.sort(codes, axis=1)
+        starts = np.ones(codes.shape, dtype=np.int64)
+        starts[:, 1:] = codes[:, 1:] != codes[:, :-1]
+        codes = np.cumsum(starts, axis=1) - 1
+        buckets = max(columns, 1)
+
+    chunk = max(1, chunk_size // max(columns, buckets))
+    counts = np.empty((rows, buckets), dtype=np.int64)
+
+    for start in range(0, rows, chunk):
+        block = codes[start:start + chunk].astype(np.int64)
+        block += np.arange(block.shape[0])[:, None] * buckets
+        counts[start:start + chunk] = np.bincount(block.ravel(),
+            minlength=block.shape[0] * buckets).reshape(-1, buckets)
+
+    return counts
@@ -1,40 +1,58 @@
 """Guess."""
 
-from collections import Counter
-from math import inf
-from joblib import Memory
-import words
+import hashlib
+import numpy as np
+from candidates import CandidateSet
+import feedback
+import lexicon
+from suggestion_cache import SuggestionCache
 
 WORDLE_SIZE = 5
 CORRECT_GUESS = [True] * WORDLE_SIZE
 
-# Cache our suggestions to disk to drastically improve run-time.
-memory = Memory("cache/", verbose=0)
+# Cache our suggestions, in memory and on disk, to drastically improve run-time.
+SUGGESTION_CACHE_PATH = "cache/suggestions.sqlite"
+SUGGESTION_CACHE_SIZE = 4096
+SUGGESTION_CACHE_DISK_SIZE = 65536
+
+def suggestion_prefix():
+    """Returns the key prefix of suggestions for the word lists in use."""
+    return feedback.matrix().digest[:8]
+
+suggestion_cache = SuggestionCache(SUGGESTION_CACHE_SIZE, SUGGESTION_CACHE_PATH,
+    SUGGESTION_CACHE_DISK_SIZE, suggestion_prefix)
 
 def valid(guess):
     """Returns whether the guess was valid."""
-    return len(guess) == WORDLE_SIZE and guess.isalpha() and (guess
-        in words.legal_words or guess in words.mystery_words)
+    return guess.isalpha() and guess in lexicon.default()
 
 def evaluate(guess, goal):
     """Evaluate a guess according to the goal word. 'Corrects' are represented by
         True, 'Presents' by False, and 'Absents' by None."""
-    evaluation = [None] * WORDLE_SIZE
+    code = feedback.lookup(guess, goal)
+    if code is None:
+        return _evaluate(guess, goal)
+    return list(feedback.evaluations(len(goal))[code])
+
+def _evaluate(guess, goal):
+    """Evaluate a guess without the precomputed feedback matrix."""
+    size = len(goal)
+    evaluation = [None] * size
     guess = list(guess)
     goal = list(goal)
 
     # Find correct letters
-    for i in range(WORDLE_SIZE):
+    for i in range(size):
         if guess[i] == goal[i]:
             evaluation[i] = True
             guess[i] = None
             goal[i] = None
 
     # Find present letters
-    for i in range(WORDLE_SIZE):
+    for i in range(size):
         guess_letter = guess[i]
         if guess[i] is not None:
-            for j in range(WORDLE_SIZE):
+            for j in range(size):
                 mystery_letter = goal[j]
                 if mystery_letter == guess_letter:
                     evaluation[i] = False
@@ -44,70 +62,123 @@ def evaluate(guess, goal):
     return evaluation
 
 def prune_candidates(evaluation, guess, candidates):
-    """Prunes candidates according to the given evaluation."""
-    corrects = [letter for letter, value in zip(guess, evaluation) if value]
-    presents = [letter for letter, value in zip(guess, evaluation) if (value
-        is not None and not value)]
-
-    for i, value in enumerate(evaluation):
-        if value is None:
-            candidates = [cand for cand in candidates if ((guess[i] != cand[i])
-                and (guess[i] not in cand or guess[i] in corrects or guess[i] in presents))]
-        elif value:
-            candidates = [cand for cand in candidates if cand[i] == guess[i]]
-        else:
-            candidates = [cand for cand in candidates if guess[i] in cand and guess[i] != cand[i]]
-
-    return candidates
-
-@memory.cache
-def make_suggestion(candidates):
+    """Prunes candidates according to the given evaluation, keeping those which
+        would have produced it. Candidate sets are pruned to candidate sets, and
+        lists of words to lists."""
+    code = feedback.encode(evaluation)
+    if isinstance(candidates, CandidateSet):
+        return candidates.prune(guess, code)
+
+    codes = feedback.compute([guess], list(candidates))[0] if candidates else []
+    return [cand for cand, cand_code in zip(candidates, codes) if cand_code == code]
+
+def _minimax(counts, total):
+    """Scores guesses by the candidates they rule out in the worst case."""
+    return total - counts.max(axis=1)
+
+def _expected(counts, total):
+    """Scores guesses by the expected number of remaining candidates
+        (negated, and scaled by the number of candidates)."""
+    return -(counts * counts).sum(axis=1)
+
+def _entropy(counts, total):
+    """Scores guesses by the entropy of their feedback."""
+    probabilities = counts / max(total, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -np.where(counts > 0, probabilities * np.log2(probabilities), 0).sum(axis=1)
+
+# Scoring criteria for suggestions. Higher scores are better.
+CRITERIA = {
+    "minimax": _minimax,
+    "expected": _expected,
+    "entropy": _entropy
+}
+DEFAULT_CRITERION = "minimax"
+
+def score_guesses(candidates, criterion=DEFAULT_CRITERION):
+    """Scores every guess in the word lists against the candidates."""
+    if isinstance(candidates, CandidateSet):
+        codes = feedback.matrix().codes[:, candidates.indices]
+    else:
+        codes = feedback.codes_for(candidates)
+    counts = feedback.bucket_counts(codes, 3 ** feedback.matrix().size)
+    return CRITERIA[criterion](counts, len(candidates))
+
+def suggestion_key(candidates, criterion=DEFAULT_CRITERION):
+    """Returns the cache key of a suggestion: the word list version, the
+        criterion and a fingerprint of the candidates."""
+    if isinstance(candidates, CandidateSet):
+        fingerprint = candidates.fingerprint()
+    else:
+        fingerprint = hashlib.blake2b(" ".join(candidates).encode(), digest_size=16).digest()
+    return suggestion_prefix() + criterion.encode() + b":" + fingerprint
+
+def make_suggestion(candidates, criterion=DEFAULT_CRITERION):
     """Makes a suggestion based upon the possible candidates."""
-    guess_scores = Counter()
-    cand_len = len(candidates)
-
-    for guess in words.mystery_words + words.legal_words:
-        hit_counts = Counter()
-        score = inf
-
-        for target in candidates:
-            evaluation = evaluate(guess, target)
-            hashed = tuple(evaluation)
-            hit_counts[hashed] += 1
-            score = min(score, cand_len - hit_counts[hashed])
-
-        guess_scores[guess] = score
-
-    max_item = guess_scores.most_common(1)[0]
-    max_score = max_item[1]
-
-    cands = [cand for cand in candidates if guess_scores[cand] == max_score]
-
-    return cands[0] if len(cands) > 0 else max_item[0]
+    key = suggestion_key(candidates, criterion)
+    suggestion = suggestion_cache.get(key)
+    if suggestion is None:
+        suggestion = _make_suggestion(candidates, criterion)
+        suggestion_cache.put(key, suggestion)
+    return suggestion
+
+def _make_suggestion(candidates, criterion):
+    """Makes a suggestion without the cache."""
+    scores = score_guesses(candidates, criterion)
+    max_score = scores.max()
+    feedback_matrix = feedback.matrix()
+
+    # Prefer a guess which could still be the answer.
+    for cand in candidates:
+        index = feedback_matrix.row(cand)
+        if (scores[index] if index is not None else 0) == max_score:
+            return cand
+
+    return feedback_matrix.guesses[int(scores.argmax())]
 
 class Guess:
     """A wordle guess, consisting of a guess word,
-        the goal word, and the remaining candidates."""
+        the goal word, and the remaining candidates. Guesses are suggested
+        according to the criterion, looked up in a compiled decision tree, or
+        made by a strategy: a callable of the candidates and the number of
+        guesses taken so far."""
 
-    def __init__(self, word, goal, candidates):
+    def __init__(self, word, goal, candidates, criterion=DEFAULT_CRITERION, tree=None,
+        strategy=None):
         """Initialize a guess."""
         self.goal = goal
         self.word = word
-        self.candidates = candidates
+        self.candidates = (candidates if isinstance(candidates, CandidateSet)
+            else CandidateSet.from_words(candidates))
+        self.criterion = criterion
+        self.tree = tree
+        self.node = None if tree is None else tree.root
+        self.strategy = strategy
+        self.guesses = 0
 
         if self.word is None:
             self.next_guess()
 
     def next_guess(self):
         """Make the next best guess."""
-        self.take_guess(make_suggestion(self.candidates))
+        if self.node is not None:
+            self.take_guess(self.tree.guess(self.node))
+        elif self.strategy is not None:
+            self.take_guess(self.strategy(self.candidates, self.guesses))
+        else:
+            self.take_guess(make_suggestion(self.candidates, self.criterion))
 
     def take_guess(self, guess):
-        """Takes a guess."""
+        """Takes a guess. Guesses which leave the decision tree fall back to suggestions."""
         self.word = guess
+        self.guesses += 1
         evaluation = evaluate(self.word, self.goal)
         self.candidates = prune_candidates(evaluation, self.word, self.candidates)
 
+        if self.node is not None:
+            self.node = (self.tree.child(self.node, feedback.encode(evaluation))
+                if self.tree.guess(self.node) == guess else None)
+
     def __repr__(self):
         """Returns the symbolic representation of the guess."""
         symbol_map = {
@@ -118,4 +189,4 @@ class Guess:
 
         evaluation = evaluate(self.word, self.goal)
         string = "".join([symbol_map[l] for l in evaluation])
-        return f"{string} ({self.word}) {'Success!' if evaluation == CORRECT_GUESS else ''}"
+        return f"{string} ({self.word}) {'Success!' if all(evaluation) else ''}"
@@ -0,0 +1,179 @@
+"""Lexicon."""
+
+import hashlib
+import os
+import struct
+import binfile
+
+LEXICON_PATH = "cache/words.bin"
+WORDS_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "words.py")
+FORMAT_VERSION = 1
+
+# Set this to the path of a compiled lexicon to play with another dictionary.
+DICTIONARY_VARIABLE = "WORDLE_DICTIONARY"
+
+# Header: magic, format version, word size, answer count, word count, source digest.
+_MAGIC = b"WORDLELX"
+_HEADER = struct.Struct("<8sHHII32s")
+_HEADER_SIZE = 64
+
+class Lexicon:
+    """Word lists packed as fixed-width ASCII records. Answers come first, so a
+        word's id is its index among all guesses, and an answer's id is also its
+        index among the answers."""
+
+    def __init__(self, records, size, answer_count, name="words", source=bytes(32)):
+        """Initialize a lexicon from its packed records."""
+        self.records = records
+        self.size = size
+        self.answer_count = answer_count
+        self.name = name
+        self.source = source
+        self._words = None
+        self._ids = None
+
+    @classmethod
+    def from_lists(cls, answers, guesses=(), name="words", source=bytes(32)):
+        """Packs the answers, then every other guess, into a lexicon."""
+        answers = list(dict.fromkeys(answers))
+        answer_set = set(answers)
+        word_list = answers + [word for word in dict.fromkeys(guesses) if word not in answer_set]
+
+        if not answers:
+            raise ValueError("A lexicon needs at least one answer!")
+        size = len(answers[0])
+        for word in word_list:
+            if len(word) != size or not word.isascii() or not word.isalpha() or not word.islower():
+                raise ValueError(f"Not a valid word for a lexicon of size {size}: {word!r}")
+
+        return cls("".join(word_list).encode("ascii"), size, len(answers), name, source)
+
+    def save(self, path):
+        """Writes the lexicon to path."""
+        header = _HEADER.pack(_MAGIC, FORMAT_VERSION, self.size, self.answer_count,
+            len(self.records) // self.size, self.source)
+        binfile.write(path, header, _HEADER_SIZE, [self.records])
+
+    @staticmethod
+    def read_header(path):
+        """Returns the (size, answer count, word count, source digest) of the
+            lexicon at path, or None if it is not a lexicon."""
+        header = binfile.read_header(path, _HEADER)
+        if header is None:
+            return None
+        magic, version, size, answer_count, word_count, source = header
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            return None
+        return size, answer_count, word_count, source
+
+    @classmethod
+    def load(cls, path, name=None):
+        """Reads the lexicon at path."""
+        header = cls.read_header(path)
+        if header is None:
+            raise ValueError(f"Not a lexicon: {path}")
+
+        size, answer_count, word_count, source = header
+        with open(path, "rb") as file:
+            file.seek(_HEADER_SIZE)
+            records = file.read(size * word_count)
+
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        return cls(records, size, answer_count, name, source)
+
+    @property
+    def words(self):
+        """Returns every guess, ordered by id."""
+        if self._words is None:
+            text = self.records.decode("ascii")
+            self._words = tuple(text[i:i + self.size] for i in range(0, len(text), self.size))
+        return self._words
+
+    @property
+    def answers(self):
+        """Returns the possible answers, ordered by id."""
+        return self.words[:self.answer_count]
+
+    @property
+    def ids(self):
+        """Returns the id of every word."""
+        if self._ids is None:
+            self._ids = {word: i for i, word in enumerate(self.words)}
+        return self._ids
+
+    def id(self, word):
+        """Returns the id of the word, or None if it is not a valid guess."""
+        return self.ids.get(word)
+
+    def is_answer(self, word):
+        """Returns whether the word is a possible answer."""
+        word_id = self.ids.get(word)
+        return word_id is not None and word_id < self.answer_count
+
+    def __contains__(self, word):
+        """Returns whether the word is a valid guess."""
+        return word in self.ids
+
+    def __len__(self):
+        """Returns the number of valid guesses."""
+        return len(self.records) // self.size
+
+def source_digest(path=WORDS_SOURCE):
+    """Returns the digest of the word list source file."""
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).digest()
+
+def compile_words(path=LEXICON_PATH):
+    """Compiles words.py into a lexicon at path and returns it."""
+    import words
+
+    compiled = Lexicon.from_lists(words.mystery_words, words.legal_words,
+        source=source_digest())
+    compiled.save(path)
+    return compiled
+
+_lexicon = None
+
+def default():
+    """Returns the lexicon in use, loading it on first use. This is the one named
+        by WORDLE_DICTIONARY if it is set, or else words.py, compiled whenever
+        the source changes."""
+    global _lexicon
+    if _lexicon is None:
+        dictionary = os.environ.get(DICTIONARY_VARIABLE)
+        if dictionary:
+            _lexicon = Lexicon.load(dictionary)
+        else:
+            header = Lexicon.read_header(LEXICON_PATH)
+            if header is not None and header[3] == source_digest():
+                _lexicon = Lexicon.load(LEXICON_PATH, "words")
+            else:
+                _lexicon = compile_words()
+    return _lexicon
+
+def main(args):
+    """Compile a lexicon from text word lists."""
+    with open(args.answers, encoding="ascii") as file:
+        answers = file.read().split()
+
+    guesses = []
+    if args.guesses is not None:
+        with open(args.guesses, encoding="ascii") as file:
+            guesses = file.read().split()
+
+    compiled = Lexicon.from_lists(answers, guesses)
+    compiled.save(args.output)
+    print(f"Compiled {len(compiled)} words ({compiled.answer_count} answers) "
+        f"of size {compiled.size} into {args.output}")
+
+if __name__ == "__main__":
+    # Only the command line needs argparse, which would otherwise dominate import time.
+    import argparse
+
+    parser = argparse.ArgumentParser(description='compile a wordle dictionary')
+    parser.add_argument('answers', help='file of possible answers, separated by whitespace')
+    parser.add_argument('guesses', nargs='?', default=None,
+        help='file of other valid guesses, separated by whitespace')
+    parser.add_argument('--output', '-o', required=True, help='compiled dictionary path')
+    main(parser.parse_args())
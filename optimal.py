@@ -0,0 +1,242 @@
+"""Optimal solver."""
+
+from collections import Counter
+from math import inf
+import time
+import numpy as np
+from candidates import CandidateSet
+import feedback
+from guess import CRITERIA, make_suggestion
+
+DEFAULT_HEURISTIC = "expected"
+DEFAULT_MAX_NODES = 20000
+DEFAULT_MAX_SECONDS = 10.0
+
+class BudgetExceeded(Exception):
+    """Raised when a search runs out of nodes or time."""
+
+class SearchStats:
+    """Counters of an optimizer's searches, by depth below the searched state.
+        Seconds are inclusive of deeper searches."""
+
+    def __init__(self):
+        """Initialize empty counters."""
+        self.nodes = Counter()
+        self.prunes = Counter()
+        self.hits = Counter()
+        self.seconds = Counter()
+        self.searches = 0
+        self.exhausted = 0
+
+    def merge(self, other):
+        """Adds another optimizer's counters to these."""
+        self.nodes.update(other.nodes)
+        self.prunes.update(other.prunes)
+        self.hits.update(other.hits)
+        self.seconds.update(other.seconds)
+        self.searches += other.searches
+        self.exhausted += other.exhausted
+
+    def report(self):
+        """Returns the counters as printable lines."""
+        lines = [f"Searches: {self.searches} ({self.exhausted} out of budget)"]
+        for depth in sorted(set(self.nodes) | set(self.prunes) | set(self.hits)):
+            lines.append(f"Depth {depth}: {self.nodes[depth]} nodes, {self.prunes[depth]} prunes, "
+                f"{self.hits[depth]} table hits, {self.seconds[depth]:.3f}s")
+        return "\n".join(lines)
+
+class Optimizer:
+    """Finds the guess minimizing the expected number of guesses, optionally
+        within a maximum number of guesses, by branch and bound.
+
+        Every answer costs one guess per turn, so a state's cost is the total
+        number of guesses over its candidates. A state of n candidates costs at
+        least 2n - 1 (one answer guessed first, every other one next), so a guess
+        splitting n candidates into k buckets costs at least 3n - k - s, where s
+        is 1 if the guess is itself a candidate. Guesses are tried in order of
+        that bound, then of a cheap heuristic score, and the search stops once the
+        bound reaches the best cost found. Exact costs, and lower bounds proven
+        by cut-off searches, are kept in a transposition table keyed on the
+        candidate set and the guesses left. When a search runs out of nodes or
+        time, the best guess found so far is used, or else the heuristic's."""
+
+    def __init__(self, max_depth=None, heuristic=DEFAULT_HEURISTIC,
+        max_nodes=DEFAULT_MAX_NODES, max_seconds=DEFAULT_MAX_SECONDS):
+        """Initialize an optimizer. Budgets apply to each suggestion."""
+        if heuristic not in CRITERIA:
+            raise ValueError(f"Not a criterion: {heuristic!r}")
+        self.max_depth = max_depth
+        self.heuristic = heuristic
+        self.max_nodes = max_nodes
+        self.max_seconds = max_seconds
+        self.table = {}
+        self.decisions = {}
+        self.stats = SearchStats()
+        self._nodes = 0
+        self._deadline = inf
+        self._root_guess = None
+
+    def __call__(self, candidates, guesses=0):
+        """Suggests a guess as a Guess strategy, after the given number of guesses."""
+        return self.suggest(candidates, guesses)
+
+    def __reduce__(self):
+        """Pickles by settings, so each worker process shares one optimizer."""
+        return optimizer, (self.max_depth, self.heuristic, self.max_nodes, self.max_seconds)
+
+    def suggest(self, candidates, guesses=0):
+        """Returns the best guess for the candidates after the given number of guesses."""
+        candidates = (candidates if isinstance(candidates, CandidateSet)
+            else CandidateSet.from_words(candidates))
+        depth = self._depth(len(candidates), guesses)
+        key = (candidates.indices.tobytes(), depth)
+
+        if key not in self.decisions:
+            self.decisions[key] = self._decide(candidates, depth)
+        return self.decisions[key]
+
+    def cost(self, candidates, guesses=0):
+        """Returns the minimum total number of guesses over the candidates, or
+            None if the search ran out of budget."""
+        candidates = (candidates if isinstance(candidates, CandidateSet)
+            else CandidateSet.from_words(candidates))
+        self._start()
+        try:
+            return self._search(candidates.indices, self._depth(len(candidates), guesses), 0, inf)[0]
+        except BudgetExceeded:
+            self.stats.exhausted += 1
+            return None
+
+    def _depth(self, count, guesses):
+        """Returns how many more guesses may be made. Without a maximum, guessing
+            one candidate at a time always succeeds within count guesses."""
+        if self.max_depth is None:
+            return max(count, 1)
+        return self.max_depth - guesses
+
+    def _start(self):
+        """Resets the budget for a new search."""
+        self.stats.searches += 1
+        self._nodes = 0
+        self._deadline = time.perf_counter() + self.max_seconds
+        self._root_guess = None
+
+    def _decide(self, candidates, depth):
+        """Searches for the best guess, degrading to the heuristic if out of budget."""
+        if len(candidates) == 0:
+            return make_suggestion(candidates, self.heuristic)
+
+        self._start()
+        try:
+            guess_row = self._search(candidates.indices, depth, 0, inf)[1]
+        except BudgetExceeded:
+            self.stats.exhausted += 1
+            guess_row = self._root_guess
+
+        if guess_row is None:
+            return make_suggestion(candidates, self.heuristic)
+        return feedback.matrix().guesses[guess_row]
+
+    def _search(self, indices, depth, ply, beta):
+        """Returns (cost, guess row) for the candidates with depth guesses left. If
+            the cost is at least beta, returns a value of at least beta instead."""
+        count = len(indices)
+        if count == 0:
+            return 0, None
+        if depth <= 0 or (depth == 1 and count > 1):
+            return inf, None
+        if count <= 2:
+            return 2 * count - 1, int(indices[0])
+
+        key = (indices.tobytes(), depth)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, guess_row, exact = entry
+            if exact or value >= beta:
+                self.stats.hits[ply] += 1
+                return value, guess_row
+
+        self._nodes += 1
+        self.stats.nodes[ply] += 1
+        if self._nodes > self.max_nodes or time.perf_counter() > self._deadline:
+            raise BudgetExceeded()
+
+        start = time.perf_counter()
+        try:
+            return self._search_guesses(indices, depth, ply, beta, key)
+        finally:
+            self.stats.seconds[ply] += time.perf_counter() - start
+
+    def _search_guesses(self, indices, depth, ply, beta, key):
+        """Tries every useful guess in order, pruning by the lower bound."""
+        feedback_matrix = feedback.matrix()
+        count = len(indices)
+        codes = feedback_matrix.codes[:, indices]
+        counts = feedback.bucket_counts(codes, 3 ** feedback_matrix.size)
+        buckets = (counts > 0).sum(axis=1)
+
+        # Answers come first among guesses, so an answer's index is also its row.
+        candidate = np.zeros(len(codes), dtype=np.int64)
+        candidate[indices] = 1
+
+        lower = (3 * count - buckets - candidate).astype(float)
+        lower[(buckets == 1) & (candidate == 0)] = inf
+        if depth == 2:
+            lower[counts.max(axis=1) > 1] = inf
+
+        scores = CRITERIA[self.heuristic](counts, count)
+        order = np.lexsort((-scores, lower))
+        best, best_guess = beta, None
+
+        for position, guess_row in enumerate(order):
+            if lower[guess_row] >= best:
+                self.stats.prunes[ply] += len(order) - position
+                break
+
+            value = self._cost(codes[guess_row], indices, depth, ply, best)
+            if value < best:
+                best, best_guess = value, int(guess_row)
+                if ply == 0:
+                    self._root_guess = best_guess
+
+        if best_guess is None:
+            self.table[key] = (best, None, False)
+        else:
+            self.table[key] = (best, best_guess, True)
+        return best, best_guess
+
+    def _cost(self, row, indices, depth, ply, cutoff):
+        """Returns the cost of a guess, or a value of at least cutoff if it is no better."""
+        solved = 3 ** feedback.matrix().size - 1
+        order = np.argsort(row, kind="stable")
+        codes, starts = np.unique(row[order], return_index=True)
+        groups = [order[first:last] for code, first, last
+            in zip(codes, starts, list(starts[1:]) + [len(order)]) if code != solved]
+        groups.sort(key=len, reverse=True)
+
+        bounds = [2 * len(group) - 1 if depth > 2 or len(group) == 1 else inf
+            for group in groups]
+        total = len(indices) + sum(bounds)
+
+        for group, bound in zip(groups, bounds):
+            if total >= cutoff:
+                self.stats.prunes[ply] += 1
+                return total
+
+            rest = total - bound
+            value = self._search(indices[np.sort(group)], depth - 1, ply + 1, cutoff - rest)[0]
+            total = rest + value
+
+        if total >= cutoff:
+            self.stats.prunes[ply] += 1
+        return total
+
+_optimizers = {}
+
+def optimizer(max_depth=None, heuristic=DEFAULT_HEURISTIC,
+    max_nodes=DEFAULT_MAX_NODES, max_seconds=DEFAULT_MAX_SECONDS):
+    """Returns this process's optimizer for the settings, creating it if needed."""
+    settings = (max_depth, heuristic, max_nodes, max_seconds)
+    if settings not in _optimizers:
+        _optimizers[settings] = Optimizer(*settings)
+    return _optimizers[settings]
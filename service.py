@@ -0,0 +1,253 @@
+"""Hint service."""
+
+import argparse
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import sys
+
+from candidates import CandidateSet
+import feedback
+from guess import CRITERIA, DEFAULT_CRITERION, make_suggestion, prune_candidates, suggestion_key, valid
+
+# Letters accepted in feedback strings, besides the game's own symbols.
+FEEDBACK_SYMBOLS = {
+    "⬜": None, "⬛": None, "b": None, "x": None, "-": None, "0": None,
+    "🟨": False, "y": False, "1": False,
+    "🟩": True, "g": True, "2": True
+}
+MAX_REQUEST_SIZE = 1 << 20
+STREAM_WINDOW = 4
+
+def parse_feedback(value):
+    """Parses feedback as an evaluation. Feedback may already be an evaluation, a
+        list of digits such as [0, 1, 2, 0, 0], or a string such as "bygbb",
+        "01200" or "⬜🟨🟩⬜⬜"."""
+    if isinstance(value, str):
+        try:
+            return [FEEDBACK_SYMBOLS[symbol] for symbol in value.lower()]
+        except KeyError as error:
+            raise ValueError(f"Not a feedback symbol: {error.args[0]!r}") from None
+
+    evaluation = []
+    for item in value:
+        # Compare by identity, since 0 == False and 1 == True.
+        if item is None or item is False or item is True:
+            evaluation.append(item)
+        elif type(item) is int and str(item) in FEEDBACK_SYMBOLS:
+            evaluation.append(FEEDBACK_SYMBOLS[str(item)])
+        else:
+            raise ValueError(f"Not an evaluation: {value!r}")
+    return evaluation
+
+def remaining_candidates(history):
+    """Returns the candidates left after a sequence of (guess, feedback) pairs."""
+    candidates = CandidateSet.all()
+
+    for guess, value in history:
+        evaluation = parse_feedback(value)
+        if not isinstance(guess, str) or not valid(guess):
+            raise ValueError(f"Not a valid guess: {guess!r}")
+        if len(evaluation) != len(guess):
+            raise ValueError(f"Feedback for '{guess}' has {len(evaluation)} letters")
+        candidates = prune_candidates(evaluation, guess, candidates)
+
+    return candidates
+
+def hint(history, criterion=DEFAULT_CRITERION):
+    """Returns the remaining candidates and the suggested next guess, which is None
+        if no candidate is consistent with the history."""
+    check_criterion(criterion)
+    candidates = remaining_candidates(history)
+    suggestion = make_suggestion(candidates, criterion) if len(candidates) > 0 else None
+    return response(candidates, suggestion)
+
+def response(candidates, suggestion):
+    """Returns the JSON-ready answer to a hint request."""
+    return {"count": len(candidates), "candidates": candidates.words(), "suggestion": suggestion}
+
+def check_criterion(criterion):
+    """Raises ValueError for an unknown criterion."""
+    if criterion not in CRITERIA:
+        raise ValueError(f"Not a criterion: {criterion!r}")
+
+def handle(request, criterion=DEFAULT_CRITERION):
+    """Answers a request of the form {"id": ..., "history": [[guess, feedback], ...],
+        "criterion": ...}, reporting bad requests as {"id": ..., "error": ...}."""
+    request_id = request.get("id") if isinstance(request, dict) else None
+    try:
+        if not isinstance(request, dict):
+            raise ValueError("Requests must be JSON objects")
+        result = hint(request.get("history", []), request.get("criterion", criterion))
+    except (TypeError, ValueError) as error:
+        return {"id": request_id, "error": str(error)}
+    return {"id": request_id, **result}
+
+def _handle_line(line, criterion=DEFAULT_CRITERION):
+    """Answers a JSON line with a JSON line."""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as error:
+        return json.dumps({"id": None, "error": f"Invalid JSON: {error}"})
+    return json.dumps(handle(request, criterion))
+
+def stream(lines, output, criterion=DEFAULT_CRITERION, workers=1):
+    """Answers JSON requests, one per line, writing one JSON response per line in
+        the same order. With several workers, a bounded window of lines is in flight."""
+    lines = (line for line in lines if line.strip())
+
+    if workers <= 1:
+        for line in lines:
+            output.write(_handle_line(line, criterion) + "\n")
+        return
+
+    # Build the feedback matrix before workers map it.
+    feedback.matrix()
+    pending = deque()
+    with ProcessPoolExecutor(workers) as executor:
+        for line in lines:
+            pending.append(executor.submit(_handle_line, line, criterion))
+            if len(pending) >= workers * STREAM_WINDOW:
+                output.write(pending.popleft().result() + "\n")
+
+        while pending:
+            output.write(pending.popleft().result() + "\n")
+
+def _suggest(indices, criterion):
+    """Makes a suggestion for candidate indices, in a worker process."""
+    return make_suggestion(CandidateSet(indices), criterion)
+
+class HintService:
+    """Answers hint requests concurrently. Suggestions are made in a pool of worker
+        processes, and requests for a state whose suggestion is already being made
+        wait for it rather than making it again."""
+
+    def __init__(self, executor=None, criterion=DEFAULT_CRITERION):
+        """Initialize a service making suggestions in the executor
+            (the event loop's default executor if None)."""
+        self.executor = executor
+        self.criterion = criterion
+        self.inflight = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    async def hint(self, history, criterion=None):
+        """Returns the remaining candidates and the suggested next guess."""
+        criterion = self.criterion if criterion is None else criterion
+        check_criterion(criterion)
+        self.requests += 1
+
+        candidates = remaining_candidates(history)
+        if len(candidates) == 0:
+            return response(candidates, None)
+
+        key = suggestion_key(candidates, criterion)
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, _suggest, candidates.indices, criterion)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # Shield the shared suggestion from cancellation by any one client.
+        return response(candidates, await asyncio.shield(future))
+
+    async def handle(self, request):
+        """Answers a hint request, as handle() does."""
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Requests must be JSON objects")
+            result = await self.hint(request.get("history", []), request.get("criterion"))
+        except (TypeError, ValueError) as error:
+            return {"id": request_id, "error": str(error)}
+        return {"id": request_id, **result}
+
+    async def connection(self, reader, writer):
+        """Serves one HTTP request: POST /hint with a JSON request, or GET /health."""
+        try:
+            try:
+                status, body = await self.route(reader)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as error:
+                status, body = "400 Bad Request", {"error": str(error)}
+            except Exception as error:
+                # Any other failure is the server's, but the client still gets a reply.
+                status, body = "500 Internal Server Error", {
+                    "error": f"{type(error).__name__}: {error}"}
+
+            payload = json.dumps(body).encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def route(self, reader):
+        """Reads a request and returns its (status, body)."""
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("Malformed request line")
+        method, path, _ = request_line
+
+        length = 0
+        while True:
+            header = (await reader.readline()).decode("latin-1").strip()
+            if not header:
+                break
+            name, _, value = header.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+
+        if length > MAX_REQUEST_SIZE:
+            return "413 Payload Too Large", {"error": "Request too large"}
+
+        if path == "/health":
+            return "200 OK", {"status": "ok", "requests": self.requests,
+                "coalesced": self.coalesced, "inflight": len(self.inflight)}
+        if path != "/hint":
+            return "404 Not Found", {"error": f"No such path: {path}"}
+        if method != "POST":
+            return "405 Method Not Allowed", {"error": "Use POST"}
+
+        try:
+            request = json.loads(await reader.readexactly(length))
+        except json.JSONDecodeError as error:
+            return "400 Bad Request", {"error": f"Invalid JSON: {error}"}
+
+        result = await self.handle(request)
+        return ("400 Bad Request" if "error" in result else "200 OK"), result
+
+async def serve(host, port, workers=None, criterion=DEFAULT_CRITERION):
+    """Serves hints over HTTP until cancelled."""
+    feedback.matrix()
+    with ProcessPoolExecutor(workers) as executor:
+        service = HintService(executor, criterion)
+        server = await asyncio.start_server(service.connection, host, port)
+        print(f"Serving hints on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+        async with server:
+            await server.serve_forever()
+
+def main(args):
+    """Run the hint service."""
+    if args.command == "stream":
+        stream(sys.stdin, sys.stdout, args.criterion, args.workers or 1)
+    else:
+        try:
+            asyncio.run(serve(args.host, args.port, args.workers, args.criterion))
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='answer wordle hint requests')
+    parser.add_argument('command', choices=["stream", "serve"],
+        help='answer JSON lines from stdin, or serve hints over HTTP')
+    parser.add_argument('--criterion', default=DEFAULT_CRITERION, choices=sorted(CRITERIA),
+        help='scoring criterion for suggestions')
+    parser.add_argument('--workers', default=None, type=int,
+        help='worker processes for suggestions (defaults to 1 for stream, all cores for serve)')
+    parser.add_argument('--host', default='127.0.0.1', help='address to serve on')
+    parser.add_argument('--port', default=8000, type=int, help='port to serve on')
+    main(parser.parse_args())
@@ -0,0 +1,120 @@
+"""Suggestion cache."""
+
+from collections import OrderedDict
+import os
+import sqlite3
+import threading
+
+class SuggestionCache:
+    """A bounded, least-recently-used cache of suggestions keyed by bytes,
+        optionally backed by a single SQLite file shared between processes.
+        The file keeps up to disk_maxsize suggestions, dropping the oldest
+        written first."""
+
+    def __init__(self, maxsize=4096, path=None, disk_maxsize=65536, prefix=None):
+        """Initialize a cache holding up to maxsize suggestions in memory. prefix
+            is a function returning the key prefix of current suggestions; when
+            the file is opened, suggestions with any other prefix are deleted."""
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.prefix = prefix
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+
+    def get(self, key):
+        """Returns the cached suggestion for the key, or None."""
+        suggestion = self.entries.get(key)
+        if suggestion is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return suggestion
+
+        if self.path is not None:
+            row = self._database().execute(
+                "SELECT suggestion FROM suggestions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row[0])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, suggestion):
+        """Caches the suggestion for the key."""
+        self._remember(key, suggestion)
+
+        if self.path is not None:
+            with self._database() as database:
+                database.execute("INSERT OR REPLACE INTO suggestions VALUES (?, ?)",
+                    (key, suggestion))
+                self._trim(database)
+
+    def clear(self, disk=False):
+        """Empties the in-memory tier, and the disk tier if asked to."""
+        self.entries.clear()
+
+        if disk and self.path is not None:
+            with self._database() as database:
+                database.execute("DELETE FROM suggestions")
+
+    def disk_size(self):
+        """Returns the number of suggestions on disk."""
+        if self.path is None:
+            return 0
+        return self._database().execute("SELECT COUNT(*) FROM suggestions").fetchone()[0]
+
+    def stats(self):
+        """Returns the cache counters."""
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def _remember(self, key, suggestion):
+        """Adds the suggestion to the in-memory tier, evicting the oldest if full."""
+        self.entries[key] = suggestion
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _database(self):
+        """Returns this thread's connection to the disk tier, creating it if needed.
+            SQLite connections may not be shared between threads or processes."""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            local.connection = sqlite3.connect(self.path, timeout=60)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute("PRAGMA synchronous=NORMAL")
+            local.connection.execute("CREATE TABLE IF NOT EXISTS suggestions "
+                "(key BLOB PRIMARY KEY, suggestion TEXT NOT NULL)")
+            local.pid = os.getpid()
+
+            with local.connection as database:
+                if self.prefix is not None:
+                    prefix = self.prefix()
+                    database.execute("DELETE FROM suggestions WHERE substr(key, 1, ?) != ?",
+                        (len(prefix), prefix))
+                self._trim(database)
+        return local.connection
+
+    def _trim(self, database):
+        """Deletes the oldest suggestions on disk beyond disk_maxsize. Rows are
+            (re)written with increasing rowids, so the oldest have the smallest."""
+        database.execute("DELETE FROM suggestions WHERE rowid <= "
+            "(SELECT MAX(rowid) FROM suggestions) - ?", (self.disk_maxsize,))
@@ -1,7 +1,27 @@
 """Unit tests."""
 
+import asyncio
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import pickle
+import tempfile
 import unittest
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+import feedback
 import guess
+from lexicon import Lexicon
+import lexicon
+from candidates import CandidateSet
+from suggestion_cache import SuggestionCache
+import wordle
+import bench
+import service
+import optimal
+import tree
+from tree import DecisionTree
 
 class TestNext(unittest.TestCase):
     """Test wordle."""
@@ -44,3 +64,389 @@ class TestNext(unittest.TestCase):
             "cynic",
             ["facts", "testy", "words", "blank", "blang", "bland", "clamp", "clang"]
         )), set(["blang"]))
+
+    def test_suggestion(self):
+        """Suggestions prefer words which are still candidates, when they score as well."""
+        self.assertEqual(guess.make_suggestion(["cigar"]), "cigar")
+        self.assertEqual(guess.make_suggestion(["rebut", "cigar"]), "rebut")
+        self.assertEqual(guess.make_suggestion(["blank", "blang", "bland", "clang"]), "badge")
+
+    def test_criteria(self):
+        """Every criterion scores all guesses, and ruling out more scores higher."""
+        candidates = ["blank", "bland", "clank", "flank", "plank"]
+        for criterion in guess.CRITERIA:
+            scores = guess.score_guesses(candidates, criterion)
+            words = feedback.matrix().words
+            self.assertEqual(len(scores), len(words))
+            self.assertGreater(scores[words.id("blank")], scores[words.id("fuzzy")])
+            self.assertIn(guess.make_suggestion(candidates, criterion), words)
+
+class TestFeedback(unittest.TestCase):
+    """Test the precomputed feedback matrix."""
+
+    WORDS = ["abcde", "zbcde", "edcba", "zzzzz", "bbaac", "aabbc", "speed", "erase", "eerie"]
+
+    def test_encode(self):
+        """Codes round-trip through evaluations."""
+        for code in range(3 ** guess.WORDLE_SIZE):
+            self.assertEqual(feedback.encode(feedback.decode(code)), code)
+        self.assertEqual(feedback.decode(feedback.encode(guess.CORRECT_GUESS)), guess.CORRECT_GUESS)
+        self.assertEqual(feedback.decode(3 ** 6 - 1, 6), [True] * 6)
+
+    def test_compute(self):
+        """Computed codes agree with evaluate, including duplicate letters."""
+        codes = feedback.compute(self.WORDS, self.WORDS)
+        for i, guess_word in enumerate(self.WORDS):
+            for j, goal in enumerate(self.WORDS):
+                self.assertEqual(feedback.decode(int(codes[i, j])),
+                    guess._evaluate(guess_word, goal))
+
+    def test_load(self):
+        """Matrices are rebuilt when the word lists change."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "feedback.bin")
+            four = Lexicon.from_lists(self.WORDS[:4], self.WORDS)
+            six = Lexicon.from_lists(self.WORDS[:6], self.WORDS)
+            matrix = feedback.FeedbackMatrix.load(path, four)
+            self.assertEqual(matrix.code("bbaac", "abcde"), feedback.encode(
+                guess._evaluate("bbaac", "abcde")))
+            self.assertIsNone(matrix.code("bbaac", "aabbc"))
+            self.assertTrue(feedback.FeedbackMatrix.is_current(path, four))
+            self.assertFalse(feedback.FeedbackMatrix.is_current(path, six))
+
+            matrix = feedback.FeedbackMatrix.load(path, six)
+            self.assertEqual(matrix.code("bbaac", "aabbc"), feedback.encode(
+                [False, False, False, False, True]))
+
+    def test_path(self):
+        """Dictionaries with the same name get their own matrix files."""
+        four = Lexicon.from_lists(self.WORDS[:4], self.WORDS, name="words")
+        six = Lexicon.from_lists(self.WORDS[:6], self.WORDS, name="words")
+        self.assertNotEqual(feedback.matrix_path(four), feedback.matrix_path(six))
+        self.assertEqual(feedback.matrix_path(four),
+            feedback.matrix_path(Lexicon.from_lists(self.WORDS[:4], self.WORDS, name="other")))
+
+class TestCandidates(unittest.TestCase):
+    """Test candidate sets."""
+
+    def test_prune(self):
+        """Candidate sets prune to the answers consistent with the evaluation."""
+        everything = CandidateSet.all()
+        evaluation = guess.evaluate("arise", "cigar")
+        pruned = guess.prune_candidates(evaluation, "arise", everything)
+        self.assertIsInstance(pruned, CandidateSet)
+        self.assertIn("cigar", pruned)
+        self.assertEqual(pruned.words(), guess.prune_candidates(evaluation, "arise", everything.words()))
+        self.assertTrue(all(guess.evaluate("arise", word) == evaluation for word in pruned))
+
+    def test_set_operations(self):
+        """Candidate sets support intersection, union and hashing."""
+        first = CandidateSet.from_words(["cigar", "rebut", "sissy"])
+        second = CandidateSet.from_words(["sissy", "rebut", "humph"])
+        self.assertEqual((first & second).words(), ["rebut", "sissy"])
+        self.assertEqual(len(first | second), 4)
+        self.assertNotIn("humph", first)
+        self.assertEqual(first & second, CandidateSet.from_words(["sissy", "rebut"]))
+        self.assertEqual(len({first & second, CandidateSet.from_words(["rebut", "sissy"])}), 1)
+        self.assertRaises(ValueError, CandidateSet.from_words, ["zzzzz"])
+
+class TestSolve(unittest.TestCase):
+    """Test solving."""
+
+    def test_parallel(self):
+        """Workers solve seeds exactly as the serial solver does."""
+        chunks = [range(0, 4), range(4, 8)]
+        with ProcessPoolExecutor(2) as executor:
+            parallel = [solutions for _, solutions, _, _ in executor.map(wordle._solve_seeds, chunks)]
+        serial = [wordle._solve_seeds(chunk)[1] for chunk in chunks]
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial[0][0], wordle.Game("cigar").solve())
+
+    def test_solve_all(self):
+        """Solving every word across workers gives the serial results."""
+        with redirect_stdout(io.StringIO()):
+            serial = wordle.Game.solve_all(workers=1)
+            parallel = wordle.Game.solve_all(workers=2)
+        self.assertEqual(parallel, serial)
+
+class TestTree(unittest.TestCase):
+    """Test compiled decision trees."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Compile the default strategy once."""
+        cls.tree = DecisionTree.build()
+
+    def test_solutions(self):
+        """The tree solves words exactly as the live solver does."""
+        solutions = dict((word, guesses) for guesses, word in self.tree.solutions())
+        for word in ["cigar", "mover", "rebut", "arise"]:
+            self.assertEqual(wordle.Game(word).solve(), (solutions[word], word))
+            self.assertEqual(wordle.Game(word).solve(tree=self.tree), (solutions[word], word))
+
+    def test_lookup(self):
+        """Guesses follow the tree, and leave it when they differ from it."""
+        start = self.tree.guess(self.tree.root)
+        code = feedback.encode(guess.evaluate(start, "cigar"))
+        self.assertIsNotNone(self.tree.child(self.tree.root, code))
+        self.assertIsNone(self.tree.child(self.tree.root, 3 ** guess.WORDLE_SIZE - 1))
+
+        followed = guess.Guess(None, "cigar", CandidateSet.all(), tree=self.tree)
+        self.assertEqual(followed.node, self.tree.child(self.tree.root, code))
+        followed.take_guess("rebut" if followed.word != "rebut" else "humph")
+        self.assertIsNone(followed.node)
+
+    def test_save(self):
+        """Saved trees load and pickle by path."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tree.bin")
+            self.tree.save(path)
+            loaded = pickle.loads(pickle.dumps(DecisionTree.load(path)))
+            self.assertEqual(loaded.path, path)
+            self.assertEqual((loaded.start, loaded.criterion), (self.tree.start, self.tree.criterion))
+            self.assertEqual(loaded.depths().tolist(), self.tree.depths().tolist())
+
+    def test_rebuild(self):
+        """Truncated trees are rebuilt rather than loaded."""
+        with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(tree, "TREE_DIRECTORY", directory):
+            path = tree.tree_path(self.tree.start, self.tree.criterion)
+            self.tree.save(path)
+            with open(path, "r+b") as file:
+                file.truncate(os.path.getsize(path) - 2)
+            with self.assertRaises(ValueError):
+                DecisionTree.load(path)
+
+            rebuilt = tree.load_tree(self.tree.start, self.tree.criterion)
+            self.assertEqual(rebuilt.depths().tolist(), self.tree.depths().tolist())
+
+class TestSuggestionCache(unittest.TestCase):
+    """Test the suggestion cache."""
+
+    def test_eviction(self):
+        """The least recently used suggestion is evicted first."""
+        cache = SuggestionCache(2)
+        cache.put(b"a", "cigar")
+        cache.put(b"b", "rebut")
+        self.assertEqual(cache.get(b"a"), "cigar")
+        cache.put(b"c", "sissy")
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(cache.get(b"c"), "sissy")
+        self.assertEqual(cache.stats(), {"size": 2, "hits": 2, "disk_hits": 0,
+            "misses": 1, "evictions": 1})
+
+    def test_disk(self):
+        """Suggestions evicted from memory are found on disk."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SuggestionCache(1, os.path.join(directory, "suggestions.sqlite"))
+            cache.put(b"a", "cigar")
+            cache.put(b"b", "rebut")
+            self.assertEqual(cache.get(b"a"), "cigar")
+            self.assertEqual(cache.disk_hits, 1)
+            cache.clear(disk=True)
+            self.assertIsNone(cache.get(b"b"))
+
+    def test_disk_bound(self):
+        """The disk tier keeps the newest suggestions for the current prefix."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "suggestions.sqlite")
+            cache = SuggestionCache(1, path, 3)
+            for word in ["cigar", "rebut", "sissy", "humph", "awake"]:
+                cache.put(b"old:" + word.encode(), word)
+            cache.put(b"new:cigar", "cigar")
+            self.assertEqual(cache.disk_size(), 3)
+            self.assertIsNone(cache.get(b"old:rebut"))
+            self.assertEqual(cache.get(b"old:awake"), "awake")
+
+            reopened = SuggestionCache(1, path, 3, lambda: b"new:")
+            self.assertEqual(reopened.disk_size(), 1)
+            self.assertEqual(reopened.get(b"new:cigar"), "cigar")
+
+    def test_key(self):
+        """Keys depend on the candidates and criterion, not on how they are held."""
+        candidates = CandidateSet.from_words(["rebut", "cigar"])
+        self.assertEqual(guess.suggestion_key(candidates),
+            guess.suggestion_key(CandidateSet.from_words(["cigar", "rebut"])))
+        self.assertNotEqual(guess.suggestion_key(candidates),
+            guess.suggestion_key(candidates, "entropy"))
+        self.assertNotEqual(guess.suggestion_key(["rebut", "cigar"]),
+            guess.suggestion_key(["cigar", "rebut"]))
+
+class TestLexicon(unittest.TestCase):
+    """Test compiled word lists."""
+
+    def test_ids(self):
+        """Answers come first, and every word has a stable id."""
+        words = Lexicon.from_lists(["cigar", "rebut"], ["aahed", "cigar", "zymic"])
+        self.assertEqual(words.words, ("cigar", "rebut", "aahed", "zymic"))
+        self.assertEqual(words.answers, ("cigar", "rebut"))
+        self.assertEqual(words.id("zymic"), 3)
+        self.assertIsNone(words.id("zzzzz"))
+        self.assertTrue(words.is_answer("rebut"))
+        self.assertFalse(words.is_answer("aahed"))
+        self.assertIn("aahed", words)
+        self.assertRaises(ValueError, Lexicon.from_lists, ["cigar", "arisen"])
+        self.assertRaises(ValueError, Lexicon.from_lists, ["CIGAR"])
+
+    def test_save(self):
+        """Lexicons round-trip through their compiled form."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "six.bin")
+            Lexicon.from_lists(["sissys", "pithys"], ["cynics"]).save(path)
+            loaded = Lexicon.load(path)
+            self.assertEqual((loaded.name, loaded.size, loaded.answer_count), ("six", 6, 2))
+            self.assertEqual(loaded.words, ("sissys", "pithys", "cynics"))
+
+    def test_default(self):
+        """The default lexicon matches the feedback matrix."""
+        self.assertEqual(lexicon.default().words, feedback.matrix().guesses)
+        self.assertEqual(lexicon.default().answers, feedback.matrix().answers)
+
+class TestBench(unittest.TestCase):
+    """Test benchmark comparison."""
+
+    @staticmethod
+    def results(seconds, distribution):
+        """Returns benchmark results with a single timing."""
+        return {"benchmarks": {"solve_all[warm]": {"seconds": seconds}},
+            "distribution": distribution, "failed": []}
+
+    def test_compare(self):
+        """Slowdowns beyond the threshold and changed distributions are regressions."""
+        baseline = self.results(1.0, {"3": 2, "4": 1})
+        self.assertEqual(bench.compare(baseline, self.results(1.05, {"3": 2, "4": 1}), 0.1), [])
+        self.assertEqual(bench.compare(baseline, self.results(0.5, {"3": 2, "4": 1}), 0.1), [])
+        self.assertEqual(len(bench.compare(baseline, self.results(1.2, {"3": 2, "4": 1}), 0.1)), 1)
+        self.assertEqual(len(bench.compare(baseline, self.results(1.0, {"3": 1, "4": 2}), 0.1)), 1)
+        self.assertEqual(bench.compare(baseline, self.results(1.0, None), 0.1), [])
+
+class TestService(unittest.TestCase):
+    """Test the hint service."""
+
+    HISTORY = [["arise", "yyybb"], ["radar", "⬜⬜⬜🟩🟩"]]
+
+    def test_feedback(self):
+        """Feedback may be given as letters, digits, symbols or evaluations."""
+        evaluation = [False, None, True, None, None]
+        for value in ["ybgbb", "10200", "🟨⬜🟩⬜⬜", evaluation, [1, 0, 2, 0, 0]]:
+            self.assertEqual(service.parse_feedback(value), evaluation)
+        self.assertEqual(service.parse_feedback([0, 1, 2, 0, 0]), service.parse_feedback("01200"))
+        self.assertEqual(service.parse_feedback([0, 0, 0, 0, 0]), service.parse_feedback("bbbbb"))
+        self.assertRaises(ValueError, service.parse_feedback, "ybgbz")
+        self.assertRaises(ValueError, service.parse_feedback, [1, 0, 3, 0, 0])
+        self.assertRaises(ValueError, service.parse_feedback, [1.0, 0, 2, 0, 0])
+
+    def test_hint(self):
+        """Hints narrow down the candidates and suggest the next guess."""
+        self.assertEqual(service.hint(self.HISTORY),
+            {"count": 2, "candidates": ["cigar", "vicar"], "suggestion": "cigar"})
+        self.assertEqual(service.hint([["arise", "bbbbb"], ["arise", "ggggg"]])["suggestion"], None)
+        self.assertIn("error", service.handle({"id": 1, "history": [["arise", "ybg"]]}))
+        self.assertIn("error", service.handle({"id": 1, "history": [], "criterion": "best"}))
+        self.assertEqual(service.handle({"id": 1, "history": [[5, "bbbbb"]]}),
+            {"id": 1, "error": "Not a valid guess: 5"})
+        self.assertIn("error", asyncio.run(service.HintService().handle(
+            {"id": 1, "history": [[5, "bbbbb"]]})))
+
+    def test_stream(self):
+        """Streams answer every line, in order."""
+        lines = [json.dumps({"id": 1, "history": self.HISTORY}), "", "not json",
+            json.dumps({"id": 2, "history": [[5, "bbbbb"]]}), json.dumps({"id": 3, "history": []})]
+        output = io.StringIO()
+        service.stream(lines, output)
+        responses = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([response["id"] for response in responses], [1, None, 2, 3])
+        self.assertEqual(responses[0]["suggestion"], "cigar")
+        self.assertIn("error", responses[1])
+        self.assertIn("error", responses[2])
+        self.assertEqual(responses[3]["count"], 2315)
+
+    def test_server_error(self):
+        """Unexpected failures are answered with a 500 rather than a dropped connection."""
+        class FailingService(service.HintService):
+            """A service whose every request fails."""
+
+            async def route(self, reader):
+                """Reads the request, then fails unexpectedly."""
+                await reader.readuntil(b"\r\n\r\n")
+                raise RuntimeError("broken")
+
+        async def request():
+            server = await asyncio.start_server(FailingService().connection, "127.0.0.1", 0)
+            async with server:
+                reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+                writer.write(b"GET /health HTTP/1.1\r\n\r\n")
+                reply = await reader.read()
+                writer.close()
+                return reply
+
+        head, _, body = asyncio.run(request()).partition(b"\r\n\r\n")
+        self.assertTrue(head.startswith(b"HTTP/1.1 500 "))
+        self.assertEqual(json.loads(body), {"error": "RuntimeError: broken"})
+
+    def test_coalesce(self):
+        """Concurrent requests for the same state share one suggestion."""
+        hints = service.HintService()
+
+        async def requests():
+            return await asyncio.gather(*[hints.hint(self.HISTORY[:1]) for _ in range(3)])
+
+        results = asyncio.run(requests())
+        self.assertEqual(len({result["suggestion"] for result in results}), 1)
+        self.assertEqual((hints.requests, hints.coalesced), (3, 2))
+        self.assertEqual(hints.inflight, {})
+
+class TestOptimal(unittest.TestCase):
+    """Test the optimal solver."""
+
+    CANDIDATES = CandidateSet.from_words(["cigar", "radio", "viral", "tapir", "flair", "tiara",
+        "rabid", "rabbi", "diary", "nadir", "chair", "radii", "vicar", "ratio", "circa",
+        "rapid", "rival"])
+
+    @staticmethod
+    def heuristic_cost(candidates):
+        """Returns the total guesses the minimax suggestions take over the candidates."""
+        suggestion = guess.make_suggestion(candidates)
+        codes = candidates.codes(suggestion)
+        solved = 3 ** guess.WORDLE_SIZE - 1
+        return len(candidates) + sum(TestOptimal.heuristic_cost(candidates.prune(suggestion, code))
+            for code in set(codes.tolist()) if code != solved)
+
+    def test_cost(self):
+        """Optimal costs are exact for small sets and never worse than the heuristic's."""
+        optimizer = optimal.Optimizer()
+        self.assertEqual(optimizer.cost(["cigar"]), 1)
+        self.assertEqual(optimizer.cost(["cigar", "rebut"]), 3)
+        self.assertLessEqual(optimizer.cost(self.CANDIDATES), self.heuristic_cost(self.CANDIDATES))
+        self.assertEqual(optimal.Optimizer(max_depth=1).cost(["cigar", "rebut"]), float("inf"))
+        self.assertGreater(optimizer.stats.nodes[0], 0)
+
+    def test_budget(self):
+        """Searches out of budget fall back to the heuristic."""
+        optimizer = optimal.Optimizer(max_nodes=1)
+        self.assertEqual(optimizer.suggest(CandidateSet.all()),
+            guess.make_suggestion(CandidateSet.all(), optimal.DEFAULT_HEURISTIC))
+        self.assertEqual(optimizer.stats.exhausted, 1)
+
+    def test_strategy(self):
+        """Optimizers are Guess strategies, shared by settings across pickling."""
+        optimizer = optimal.optimizer(wordle.DEFAULT_MAX_GUESSES, max_nodes=50, max_seconds=1.0)
+        self.assertIs(pickle.loads(pickle.dumps(optimizer)), optimizer)
+        guesses, word = wordle.Game("cigar").solve(strategy=optimizer)
+        self.assertEqual(word, "cigar")
+        self.assertLessEqual(guesses, wordle.DEFAULT_MAX_GUESSES)
+
+    def test_worker_stats(self):
+        """Chunks report their own search counters, wherever they are solved."""
+        optimizer = optimal.optimizer(wordle.DEFAULT_MAX_GUESSES, max_nodes=40, max_seconds=1.0)
+        with ProcessPoolExecutor(1) as executor:
+            _, _, _, stats = executor.submit(wordle._solve_seeds, range(2, 4),
+                strategy=optimizer).result()
+        self.assertGreater(stats.searches, 0)
+        self.assertEqual(optimizer.stats.searches, 0)
+
+        _, _, _, serial = wordle._solve_seeds(range(2, 4), strategy=optimizer)
+        self.assertEqual(serial.searches, stats.searches)
+        self.assertEqual(optimizer.stats.searches, stats.searches)
+        optimizer.stats.merge(stats)
+        self.assertEqual(optimizer.stats.searches, 2 * stats.searches)
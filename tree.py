@@ -0,0 +1,199 @@
+"""Decision tree."""
+
+import os
+import struct
+import numpy as np
+import binfile
+from candidates import CandidateSet
+import feedback
+from guess import DEFAULT_CRITERION, make_suggestion
+
+TREE_DIRECTORY = "cache/"
+FORMAT_VERSION = 1
+
+# Header: magic, format version, word size, word list digest, criterion,
+# start word, node count and edge count.
+_MAGIC = b"WORDLETR"
+_HEADER = struct.Struct("<8sHH32s16s16sII")
+_HEADER_SIZE = 96
+
+class DecisionTree:
+    """A compiled solving strategy. Each node holds the guess to make, and its
+        edges map every feedback code other than success to the next node.
+        Nodes and edges are stored as flat arrays, memory-mapped from disk."""
+
+    def __init__(self, node_guesses, node_edges, edge_children, edge_codes,
+        start, criterion, path=None):
+        """Initialize a decision tree. node_edges[n]:node_edges[n + 1] are the
+            edges of node n, sorted by code."""
+        self.node_guesses = node_guesses
+        self.node_edges = node_edges
+        self.edge_children = edge_children
+        self.edge_codes = edge_codes
+        self.start = start
+        self.criterion = criterion
+        self.path = path
+        self.root = 0
+        self._edge_keys = None
+
+    @classmethod
+    def build(cls, start=None, criterion=DEFAULT_CRITERION):
+        """Walks the strategy from the start word (or its own first suggestion)
+            over every answer and compiles it into a tree."""
+        feedback_matrix = feedback.matrix()
+        solved = 3 ** feedback_matrix.size - 1
+        everything = CandidateSet.all()
+        start = make_suggestion(everything, criterion) if start is None else start
+        if feedback_matrix.row(start) is None:
+            raise ValueError(f"Not a valid start word: {start}")
+
+        node_guesses = []
+        node_children = []
+        stack = [(everything, start, None)]
+
+        while stack:
+            candidates, word, parent = stack.pop()
+            node = len(node_guesses)
+            node_guesses.append(feedback_matrix.row(word))
+            node_children.append([])
+
+            if parent is not None:
+                node_children[parent[0]].append((parent[1], node))
+
+            codes = candidates.codes(word)
+            for code in np.unique(codes):
+                if code == solved:
+                    continue
+
+                remaining = CandidateSet(candidates.indices[codes == code])
+                if len(remaining) == len(candidates) > 1:
+                    raise ValueError(f"'{word}' does not split {candidates}")
+                stack.append((remaining, make_suggestion(remaining, criterion),
+                    (node, int(code))))
+
+        node_edges = [0]
+        edge_children = []
+        edge_codes = []
+        for children in node_children:
+            for code, child in sorted(children):
+                edge_codes.append(code)
+                edge_children.append(child)
+            node_edges.append(len(edge_codes))
+
+        return cls(np.array(node_guesses, dtype=np.int32), np.array(node_edges, dtype=np.int32),
+            np.array(edge_children, dtype=np.int32), np.array(edge_codes, dtype=np.uint16),
+            start, criterion)
+
+    def save(self, path):
+        """Writes the tree to path."""
+        header = _HEADER.pack(_MAGIC, FORMAT_VERSION, feedback.matrix().size,
+            feedback.matrix().digest, self.criterion.encode("ascii"),
+            self.start.encode("ascii"), len(self.node_guesses), len(self.edge_codes))
+        binfile.write(path, header, _HEADER_SIZE, (np.ascontiguousarray(array).tobytes()
+            for array in (self.node_guesses, self.node_edges, self.edge_children, self.edge_codes)))
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps the tree at path. Raises ValueError if it is missing or
+            truncated, or was compiled for other word lists or by another format version."""
+        header = binfile.read_header(path, _HEADER)
+        if header is None:
+            raise ValueError(f"Not a decision tree: {path}")
+
+        magic, version, size, word_digest, criterion, start, nodes, edges = header
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a decision tree: {path}")
+        if size != feedback.matrix().size or word_digest != feedback.matrix().digest:
+            raise ValueError(f"Decision tree compiled for other word lists: {path}")
+
+        layout = ((np.int32, nodes), (np.int32, nodes + 1), (np.int32, edges), (np.uint16, edges))
+        if os.path.getsize(path) != _HEADER_SIZE + sum(
+            length * np.dtype(dtype).itemsize for dtype, length in layout):
+            raise ValueError(f"Truncated decision tree: {path}")
+
+        arrays = []
+        offset = _HEADER_SIZE
+        for dtype, length in layout:
+            arrays.append(np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(length,)))
+            offset += length * np.dtype(dtype).itemsize
+
+        return cls(*arrays, start.rstrip(b"\0").decode("ascii"),
+            criterion.rstrip(b"\0").decode("ascii"), path)
+
+    def __reduce__(self):
+        """Pickles saved trees by path, so workers map the file instead of copying it."""
+        if self.path is None:
+            return super().__reduce__()
+        return DecisionTree.load, (self.path,)
+
+    def __len__(self):
+        """Returns the number of nodes."""
+        return len(self.node_guesses)
+
+    def guess(self, node):
+        """Returns the guess to make at the node."""
+        return feedback.matrix().guesses[self.node_guesses[node]]
+
+    def child(self, node, code):
+        """Returns the node following the feedback code, or None if there is none."""
+        first, last = self.node_edges[node], self.node_edges[node + 1]
+        edge = first + int(np.searchsorted(self.edge_codes[first:last], code))
+        if edge < last and self.edge_codes[edge] == code:
+            return int(self.edge_children[edge])
+        return None
+
+    def depths(self):
+        """Returns the number of guesses the tree takes for every answer, walking
+            all answers down the tree together."""
+        feedback_matrix = feedback.matrix()
+        solved = 3 ** feedback_matrix.size - 1
+        buckets = 3 ** feedback_matrix.size
+
+        if self._edge_keys is None:
+            # Edges are sorted by node, then code, so their keys are sorted too.
+            self._edge_keys = (np.repeat(np.arange(len(self), dtype=np.int64),
+                np.diff(self.node_edges)) * buckets + self.edge_codes)
+
+        answers = np.arange(len(feedback_matrix.answers))
+        nodes = np.full(len(answers), self.root, dtype=np.int64)
+        depths = np.zeros(len(answers), dtype=np.int64)
+        depth = 0
+
+        while len(answers) > 0:
+            depth += 1
+            codes = feedback_matrix.codes[self.node_guesses[nodes], answers].astype(np.int64)
+            done = codes == solved
+            depths[answers[done]] = depth
+
+            answers, nodes, codes = answers[~done], nodes[~done], codes[~done]
+            edges = np.searchsorted(self._edge_keys, nodes * buckets + codes)
+            nodes = self.edge_children[edges]
+
+        return depths
+
+    def solutions(self):
+        """Returns the (guesses, word) solution of every answer, in answer order."""
+        return list(zip(self.depths().tolist(), feedback.matrix().answers))
+
+def tree_path(start, criterion=DEFAULT_CRITERION):
+    """Returns where the tree for the word lists, start word and criterion is stored."""
+    return os.path.join(TREE_DIRECTORY,
+        f"tree-{feedback.matrix().digest.hex()[:16]}-{start}-{criterion}.bin")
+
+def load_tree(start=None, criterion=DEFAULT_CRITERION, rebuild=False):
+    """Returns the tree for the start word and criterion, building and saving it
+        if it does not exist yet or the saved one is stale or truncated."""
+    if start is None:
+        start = make_suggestion(CandidateSet.all(), criterion)
+
+    path = tree_path(start, criterion)
+    if not rebuild and os.path.exists(path):
+        try:
+            return DecisionTree.load(path)
+        except ValueError:
+            pass
+
+    decision_tree = DecisionTree.build(start, criterion)
+    decision_tree.save(path)
+    return DecisionTree.load(path)
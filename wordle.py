@@ -3,13 +3,22 @@
 import argparse
 from ast import Raise
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from multiprocessing.sharedctypes import Value
+import os
 import random
+import time
 
-from guess import CORRECT_GUESS, Guess, evaluate, valid, prune_candidates
-import words
+from candidates import CandidateSet
+from guess import CRITERIA, DEFAULT_CRITERION, Guess, evaluate, valid, prune_candidates
+import feedback
+import lexicon
+from optimal import DEFAULT_MAX_NODES, DEFAULT_MAX_SECONDS, SearchStats, optimizer
+from tree import load_tree
 
 DEFAULT_MAX_GUESSES = 6
+SOLVE_CHUNK_SIZE = 32
 
 class Game:
     """Representation of a game of Wordle.
@@ -17,12 +26,12 @@ class Game:
 
     def __init__(self, seed = None):
         """Initialize a wordle game, with a random starting word if none is given."""
-        self.mystery_word = random.choice(words.mystery_words) if seed is None else seed
+        self.mystery_word = random.choice(lexicon.default().answers) if seed is None else seed
 
     def play(self, verbose=False, max_guesses = DEFAULT_MAX_GUESSES):
         """Plays a game of wordle."""
         guesses = 0
-        guess = Guess("", self.mystery_word, words.mystery_words)
+        guess = Guess("", self.mystery_word, CandidateSet.all())
 
         while guesses < max_guesses:
             guess.word = input("Enter guess: ").lower()
@@ -32,21 +41,24 @@ class Game:
                 guesses += 1
                 print(guess)
 
-                if evaluate(guess.word, guess.goal) == CORRECT_GUESS:
+                if all(evaluate(guess.word, guess.goal)):
                     return
 
                 guess.take_guess(guess.word)
 
                 if verbose:
-                    print(guess.candidates)
+                    print(guess.candidates.words())
 
         print(f"\nFailed... the wordle was '{self.mystery_word}'.")
 
-    def solve(self, verbose=False):
-        """Solves a game of wordle."""
+    def solve(self, verbose=False, criterion=DEFAULT_CRITERION, tree=None, start=None,
+        strategy=None):
+        """Solves a game of wordle, opening with the start word if one is given."""
         guesses = 0
 
-        guess = Guess(None, self.mystery_word, words.mystery_words)
+        guess = Guess(start, self.mystery_word, CandidateSet.all(), criterion, tree, strategy)
+        if start is not None:
+            guess.take_guess(start)
 
         while True:
             guesses += 1
@@ -54,50 +66,178 @@ class Game:
             if verbose:
                 print(guess)
 
-            if evaluate(guess.word, guess.goal) == CORRECT_GUESS:
+            if all(evaluate(guess.word, guess.goal)):
                 return guesses, self.mystery_word
 
             if verbose:
-                print(guess.candidates)
+                print(guess.candidates.words())
 
             guess.next_guess()
 
     @staticmethod
-    def solve_all(max_guesses = DEFAULT_MAX_GUESSES):
-        """Solves all posssible Wordles and outputs a counter of results."""
+    def solve_all(max_guesses = DEFAULT_MAX_GUESSES, workers = 1,
+        criterion = DEFAULT_CRITERION, tree = None, start = None, strategy = None):
+        """Solves all posssible Wordles and outputs a counter of results.
+            Seeds are spread across a pool of worker processes when workers > 1,
+            unless a compiled decision tree answers every word at once."""
         solves = Counter()
         fails = set()
+        throughput = Counter()
+        elapsed = Counter()
 
-        for seed in words.mystery_words:
-            solution = Game(seed).solve()
-            solves.update([solution[0]])
+        if tree is not None:
+            begin = time.perf_counter()
+            results = [(os.getpid(), tree.solutions(), time.perf_counter() - begin, None)]
+        else:
+            results = _solve_seeds_in_pool(workers, criterion, start, strategy)
 
-            if solution[0] > max_guesses:
-                fails.add(solution[1])
+        for worker, solutions, seconds, stats in results:
+            throughput[worker] += len(solutions)
+            elapsed[worker] += seconds
+
+            # Workers search with their own copies of the strategy, so gather their counters.
+            if stats is not None and worker != os.getpid():
+                strategy.stats.merge(stats)
+
+            for guesses, word in solutions:
+                solves.update([guesses])
+
+                if guesses > max_guesses:
+                    fails.add(word)
 
         print(solves)
         print(f"Failed words: {fails}")
 
+        for worker in sorted(throughput):
+            print(f"Worker {worker}: {throughput[worker]} words in {elapsed[worker]:.2f}s "
+                f"({throughput[worker] / max(elapsed[worker], 1e-9):.1f} words/s)")
+
+        return solves, fails
+
+def _solve_seeds(seeds, criterion=DEFAULT_CRITERION, start=None, strategy=None):
+    """Solves the mystery words at the given indices, returning (worker, solutions,
+        seconds, stats), where stats are the strategy's search counters for these
+        words, if it keeps any. Only indices are sent to workers; the word lists and
+        feedback matrix are shared through the memory-mapped file."""
+    # Count this chunk's searches apart, then fold them into the strategy's own counters.
+    totals = getattr(strategy, "stats", None)
+    stats = None
+    if totals is not None:
+        stats = strategy.stats = SearchStats()
+
+    begin = time.perf_counter()
+    try:
+        solutions = [Game(lexicon.default().answers[seed]).solve(criterion=criterion,
+            start=start, strategy=strategy) for seed in seeds]
+    finally:
+        if totals is not None:
+            totals.merge(stats)
+            strategy.stats = totals
+    return os.getpid(), solutions, time.perf_counter() - begin, stats
+
+def _solve_seeds_in_pool(workers, criterion=DEFAULT_CRITERION, start=None, strategy=None):
+    """Solves every mystery word, returning each chunk's (worker, solutions, seconds, stats)."""
+    # Build or map the feedback matrix once, before any worker needs it.
+    feedback.matrix()
+    seeds = range(lexicon.default().answer_count)
+    chunks = [seeds[i:i + SOLVE_CHUNK_SIZE] for i in range(0, len(seeds), SOLVE_CHUNK_SIZE)]
+    solve = partial(_solve_seeds, criterion=criterion, start=start, strategy=strategy)
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(solve, chunks))
+    return [solve(chunk) for chunk in chunks]
+
+def inspect_tree(tree, worst=10):
+    """Prints the size of a decision tree, its depth histogram and worst-case words."""
+    solutions = tree.solutions()
+    depths = Counter(guesses for guesses, _ in solutions)
+    deepest = max(depths)
+
+    print(f"Tree for '{tree.start}' ({tree.criterion}): {len(tree)} nodes")
+    for depth in sorted(depths):
+        print(f"{depth} guesses: {depths[depth]}")
+    print(f"Average: {sum(guesses for guesses, _ in solutions) / len(solutions):.4f} guesses")
+    print(f"Worst case ({deepest} guesses): "
+        f"{[word for guesses, word in solutions if guesses == deepest][:worst]}")
+
+def verify_tree(tree, workers=1):
+    """Checks a decision tree against the live solver, returning the mismatched words."""
+    live = {}
+    for _, solutions, _, _ in _solve_seeds_in_pool(workers, tree.criterion, tree.start):
+        live.update((word, guesses) for guesses, word in solutions)
+
+    mismatches = [word for guesses, word in tree.solutions() if live[word] != guesses]
+    print(f"Verified {len(live) - len(mismatches)} of {len(live)} words.")
+    if mismatches:
+        print(f"Mismatched words: {mismatches}")
+    return mismatches
+
 class SeedAction(argparse.Action):
     """Validates a seed."""
     def __call__(self, parser, namespace, values, option_string=None):
-        """If a seed is not in mystery_words, it is invalid."""
-        if values not in words.mystery_words:
+        """If a seed is not a possible answer, it is invalid."""
+        if not lexicon.default().is_answer(values):
             raise ValueError("Not a valid seed!")
         setattr(namespace, self.dest, values)
 
+class StartAction(argparse.Action):
+    """Validates a start word."""
+    def __call__(self, parser, namespace, values, option_string=None):
+        """If a start word is not a valid guess, it is invalid."""
+        if not valid(values):
+            raise ValueError("Not a valid start word!")
+        setattr(namespace, self.dest, values)
+
 def main(args):
     """Run Wordle."""
+    workers = args.workers or os.cpu_count()
+
+    if args.tree == "build":
+        inspect_tree(load_tree(args.start, args.criterion, rebuild=True))
+        return
+    if args.tree is not None:
+        tree = load_tree(args.start, args.criterion)
+        if args.tree == "inspect":
+            inspect_tree(tree)
+        else:
+            verify_tree(tree, workers)
+        return
+
+    tree = load_tree(args.start, args.criterion) if args.compiled else None
+    strategy = (optimizer(DEFAULT_MAX_GUESSES, max_nodes=args.max_nodes,
+        max_seconds=args.max_seconds) if args.optimal else None)
+
     if args.manual:
         Game(args.seed).play(args.candidates)
     elif args.seed is not None:
-        Game(args.seed).solve(True)
+        Game(args.seed).solve(True, args.criterion, tree, args.start, strategy)
     else:
-        Game.solve_all()
+        Game.solve_all(workers=workers, criterion=args.criterion, tree=tree, start=args.start,
+            strategy=strategy)
+
+    if strategy is not None:
+        print(strategy.stats.report())
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='play or solve wordle')
     parser.add_argument('--manual', action="store_true", help='play manually')
     parser.add_argument('--seed', default=None, action=SeedAction, type=str, help='seed word')
     parser.add_argument('--candidates', action="store_true", help="view candidates")
+    parser.add_argument('--workers', default=1, type=int,
+        help='worker processes for solving all words (0 for all cores)')
+    parser.add_argument('--criterion', default=DEFAULT_CRITERION, choices=sorted(CRITERIA),
+        help='scoring criterion for suggestions')
+    parser.add_argument('--start', default=None, action=StartAction, type=str,
+        help='start word for the solver')
+    parser.add_argument('--compiled', action="store_true",
+        help='solve with the compiled decision tree, building it if needed')
+    parser.add_argument('--tree', default=None, choices=["build", "inspect", "verify"],
+        help='build, inspect or verify the compiled decision tree')
+    parser.add_argument('--optimal', action="store_true",
+        help='solve for the fewest expected guesses by branch and bound')
+    parser.add_argument('--max-nodes', default=DEFAULT_MAX_NODES, type=int,
+        help='nodes the optimal solver may search per guess')
+    parser.add_argument('--max-seconds', default=DEFAULT_MAX_SECONDS, type=float,
+        help='seconds the optimal solver may search per guess')
     main(parser.parse_args())